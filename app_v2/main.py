@@ -1,7 +1,38 @@
+import argparse
+
 from src.app import SSApp
+from src.server import SSServer
+from src.profiler import SSProfiler
+from src.replication import SSReplica
 
 if __name__ == "__main__":
-    app = SSApp()
+    parser = argparse.ArgumentParser(description="Secret Santa application")
+    parser.add_argument("--serve", action="store_true",
+                        help="serve sessions over TCP instead of the terminal")
+    parser.add_argument("--host", default="127.0.0.1", help="host to serve on")
+    parser.add_argument("--port", type=int, default=8023, help="port to serve on")
+    parser.add_argument("--replication-port", type=int,
+                        help="with --serve, ship the mutation log to replicas on this port")
+    parser.add_argument("--replica-of", metavar="HOST:PORT",
+                        help="run a read replica of the primary at HOST:PORT")
+    parser.add_argument("--draw-workers", type=int, default=1,
+                        help="processes used to draw events with a million or more players")
+    parser.add_argument("--profile", nargs="?", const="ssapp_profile", metavar="PREFIX",
+                        help="write PREFIX.txt and PREFIX.pstats profiling reports on exit")
+    args = parser.parse_args()
+    if (args.serve or args.replica_of) and args.profile:
+        parser.error("--profile only works with the terminal application")
+
+    if args.replica_of:
+        primary_host, _, primary_port = args.replica_of.rpartition(":")
+        app = SSReplica(primary_host, int(primary_port), args.host, args.port)
+    elif args.serve:
+        app = SSServer(host=args.host, port=args.port,
+                       replication_port=args.replication_port,
+                       draw_workers=args.draw_workers)
+    else:
+        app = SSApp(SSProfiler(args.profile) if args.profile else None,
+                    draw_workers=args.draw_workers)
     try:
         app.run()
     except KeyboardInterrupt:
@@ -0,0 +1,166 @@
+"""Cold tier for archived Secret Santa events"""
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+
+from src.models import Event
+
+
+FILE_PREFIX = "event-"
+FILE_SUFFIX = ".pkl"
+
+
+def _valid_id(event_id: str) -> bool:
+    """Event ids are decimal numbers, anything else never reaches the disk"""
+    return isinstance(event_id, str) and event_id.isascii() and event_id.isdigit()
+
+
+class SSColdStore:
+    """On-disk archive of events with an LRU cache in front of it"""
+
+    def __init__(self, path: Optional[str] = None,
+                 max_entries: int = 1024,
+                 max_bytes: Optional[int] = None):
+        """SS cold store
+
+        Events are pickled one file per event under ``path``. Loaded events are
+        kept in an LRU cache bounded by ``max_entries`` and, if given, by the
+        pickled size of the cached events in ``max_bytes``.
+
+        Without a ``path`` the archive lives in a temporary directory that is
+        removed by ``close`` or when the cold store is garbage collected.
+        """
+        self.finalizer = None
+        if path is None:
+            path = tempfile.mkdtemp(prefix="ssapp-archive-")
+            self.finalizer = weakref.finalize(self, shutil.rmtree, path, ignore_errors=True)
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+        # only ids in the index are ever mapped to a file
+        self.index: Dict[str, str] = {}
+        for name in os.listdir(self.path):
+            event_id = name[len(FILE_PREFIX):-len(FILE_SUFFIX)]
+            if name == f"{FILE_PREFIX}{event_id}{FILE_SUFFIX}" and _valid_id(event_id):
+                self.index[event_id] = os.path.join(self.path, name)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache: "OrderedDict[str, Tuple[Event, int]]" = OrderedDict()
+        self.cache_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.lock = threading.Lock()
+
+    def close(self) -> None:
+        """Removes the archive directory if the cold store created it"""
+        if self.finalizer is not None:
+            self.finalizer()
+            self.index.clear()
+            self.cache.clear()
+            self.cache_bytes = 0
+
+    def __cache(self, event: Event, size: int) -> None:
+        """Adds an event to the LRU cache and evicts to stay within budget"""
+        if event.event_id in self.cache:
+            _, old_size = self.cache.pop(event.event_id)
+            self.cache_bytes -= old_size
+        self.cache[event.event_id] = (event, size)
+        self.cache_bytes += size
+        while self.cache and (len(self.cache) > self.max_entries or
+                              (self.max_bytes is not None and
+                               self.cache_bytes > self.max_bytes)):
+            _, (_, evicted_size) = self.cache.popitem(last=False)
+            self.cache_bytes -= evicted_size
+
+    def __contains__(self, event_id: str) -> bool:
+        return event_id in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over the ids of the archived events"""
+        with self.lock:
+            return iter(list(self.index))
+
+    def archive(self, event: Event) -> None:
+        """Writes the event to disk, replacing any older copy atomically"""
+        if not _valid_id(event.event_id):
+            raise ValueError(f"{event.event_id=} cannot be archived")
+        data = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+        file_name = os.path.join(self.path, f"{FILE_PREFIX}{event.event_id}{FILE_SUFFIX}")
+        fd, tmp_name = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_name, file_name)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+        with self.lock:
+            self.index[event.event_id] = file_name
+            if event.event_id in self.cache:
+                self.__cache(event, len(data))
+
+    def __read(self, event_id: str) -> Optional[Tuple[Event, int]]:
+        """Reads the event and its pickled size from disk"""
+        file_name = self.index.get(event_id)
+        if file_name is None:
+            return None
+        try:
+            with open(file_name, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        self.loads += 1
+        return pickle.loads(data), len(data)
+
+    def load(self, event_id: str) -> Optional[Event]:
+        """Reads the event from disk without touching the cache"""
+        res = self.__read(event_id)
+        return res[0] if res else None
+
+    def get(self, event_id: str) -> Optional[Event]:
+        """Returns the archived event, loading it into the cache on a miss"""
+        with self.lock:
+            if event_id in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(event_id)
+                return self.cache[event_id][0]
+            self.misses += 1
+        res = self.__read(event_id)
+        if res is None:
+            return None
+        with self.lock:
+            # skip caching an event removed while it was being read
+            if event_id in self.index:
+                self.__cache(*res)
+        return res[0]
+
+    def remove(self, event_id: str) -> None:
+        """Deletes the event from the archive"""
+        with self.lock:
+            if event_id in self.cache:
+                _, size = self.cache.pop(event_id)
+                self.cache_bytes -= size
+            file_name = self.index.pop(event_id, None)
+        if file_name is None:
+            return
+        try:
+            os.remove(file_name)
+        except FileNotFoundError:
+            pass
+
+    def metrics(self) -> Dict[str, float]:
+        """Returns the cache metrics"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "disk_loads": self.loads,
+            "cached_entries": len(self.cache),
+            "cached_bytes": self.cache_bytes,
+        }
@@ -0,0 +1,34 @@
+"""Bulk integrity audit of santa maps
+
+The checks of every closed event run as set operations mapped over all the
+events at once, so the names are only hashed in C and no Python code runs
+per name.
+"""
+from itertools import compress, repeat
+from operator import attrgetter, eq, ne, not_
+from typing import Iterable, List
+
+from src.models import Event, EventStatus
+
+
+def audit_events(events: Iterable[Event]) -> List[str]:
+    """Returns the ids of the closed events with an invalid santa map
+
+    A valid map is a permutation of the participants with no one assigned
+    to themselves. Events listing the same participant twice are invalid too.
+    """
+    closed = [event for event in events if event.event_status is EventStatus.CLOSED]
+    participants = list(map(attrgetter("event_participants"), closed))
+    santa_maps = list(map(attrgetter("event_santa_map"), closed))
+
+    # with as many pairs as participants, givers (the keys) are distinct, so a
+    # set of participants or receivers holding every giver equals the givers,
+    # which rules out repeated participants, foreign names and shared receivers
+    wrong_size = map(ne, map(len, participants), map(len, santa_maps))
+    foreign_giver = map(not_, map(set.issuperset, map(set, participants), santa_maps))
+    shared_receiver = map(not_, map(set.issuperset, map(set, map(dict.values, santa_maps)),
+                                    santa_maps))
+    fixed_point = map(any, map(map, repeat(eq), santa_maps, map(dict.values, santa_maps)))
+    bad = map(any, zip(wrong_size, foreign_giver, shared_receiver, fixed_point))
+    return [event.event_id for event in compress(closed, bad)]
+
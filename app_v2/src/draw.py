@@ -0,0 +1,172 @@
+"""Secret Santa draws
+
+A draw shuffles the players and has each one give to the next, which gives
+a single cycle with no self-assignment. The parallel draw builds the same
+uniformly random shuffle by scattering the player indices into random
+buckets and shuffling every bucket in its own process. Players listed
+twice are drawn once.
+"""
+import random
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+INDEX_TYPE = "q"
+EXCLUSION_ATTEMPTS = 32
+
+
+def _cycle_map(order: List[str]) -> Dict[str, str]:
+    """Maps every player to the next one in the order"""
+    return dict(zip(order, order[1:] + order[:1]))
+
+
+def single_cycle_map(players: Sequence[str], seed: Optional[int] = None) -> Dict[str, str]:
+    """Returns a single cycle santa map drawn in this process"""
+    order = list(dict.fromkeys(players))
+    if len(order) < 2:
+        return {}
+    random.Random(seed).shuffle(order)
+    return _cycle_map(order)
+
+
+def excluding_map(draw: Callable[[int], Dict[str, str]], exclude: Dict[str, str],
+                  seed: Optional[int] = None,
+                  attempts: int = EXCLUSION_ATTEMPTS) -> Dict[str, str]:
+    """Redraws until no giver gets the receiver they have in exclude
+
+    When every attempt repeats a pair, e.g. with only two players, the draw
+    repeating the fewest pairs is returned.
+    """
+    rng = random.Random(seed)
+    best: Dict[str, str] = {}
+    best_repeats = -1
+    for _ in range(attempts):
+        santa_map = draw(rng.getrandbits(64))
+        repeats = sum(exclude.get(giver) == receiver for giver, receiver in santa_map.items())
+        if best_repeats < 0 or repeats < best_repeats:
+            best, best_repeats = santa_map, repeats
+        if repeats == 0:
+            break
+    return best
+
+
+def _scatter_chunk(args: Tuple[str, int, int, int, int]) -> List[int]:
+    """Groups the indices of a chunk by random bucket, in place
+
+    Returns the size of every bucket within the chunk.
+    """
+    name, start, end, num_buckets, seed = args
+    shm = SharedMemory(name=name)
+    indices = shm.buf.cast(INDEX_TYPE)
+    try:
+        rng = random.Random(seed)
+        buckets: List[List[int]] = [[] for _ in range(num_buckets)]
+        for index, bucket in zip(range(start, end),
+                                 rng.choices(range(num_buckets), k=end - start)):
+            buckets[bucket].append(index)
+        pos = start
+        for bucket in buckets:
+            indices[pos:pos + len(bucket)] = array(INDEX_TYPE, bucket)
+            pos += len(bucket)
+        return [len(bucket) for bucket in buckets]
+    finally:
+        indices.release()
+        shm.close()
+
+
+def _link_bucket(args: Tuple[str, str, List[Tuple[int, int]], int]) -> Optional[Tuple[int, int]]:
+    """Shuffles a bucket gathered from every chunk and links it into a path
+
+    Every index of the bucket gets the next one as successor. Returns the
+    first and last index, which the parent links to the other buckets.
+    """
+    src_name, succ_name, segments, seed = args
+    src_shm = SharedMemory(name=src_name)
+    succ_shm = SharedMemory(name=succ_name)
+    src = src_shm.buf.cast(INDEX_TYPE)
+    succ = succ_shm.buf.cast(INDEX_TYPE)
+    try:
+        bucket: List[int] = []
+        for start, length in segments:
+            bucket.extend(src[start:start + length])
+        if not bucket:
+            return None
+        random.Random(seed).shuffle(bucket)
+        for giver, receiver in zip(bucket, bucket[1:]):
+            succ[giver] = receiver
+        return bucket[0], bucket[-1]
+    finally:
+        src.release()
+        succ.release()
+        src_shm.close()
+        succ_shm.close()
+
+
+def draw_pool(workers: int) -> ProcessPoolExecutor:
+    """Returns a pool for parallel draws
+
+    Draws run in threads, so the workers are started by a fork server or
+    spawned rather than forked from a multi-threaded process.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def parallel_single_cycle_map(players: Sequence[str], workers: int,
+                              seed: Optional[int] = None,
+                              pool: Optional[ProcessPoolExecutor] = None) -> Dict[str, str]:
+    """Returns a single cycle santa map drawn in a pool of processes
+
+    The workers shuffle the player indices and work out the receiver of
+    every giver, which leaves the parent a single pass to build the map in
+    roster order. Without a pool one is started for this draw. The same
+    seed and number of workers always give the same map.
+    """
+    players = list(dict.fromkeys(players))
+    num_players = len(players)
+    if num_players < 2:
+        return {}
+    workers = max(1, min(workers, num_players))
+    rng = random.Random(seed)
+    scatter_seeds = [rng.getrandbits(64) for _ in range(workers)]
+    shuffle_seeds = [rng.getrandbits(64) for _ in range(workers)]
+
+    size = num_players * array(INDEX_TYPE).itemsize
+    src_shm = SharedMemory(create=True, size=size)
+    succ_shm = SharedMemory(create=True, size=size)
+    own_pool = pool is None
+    if own_pool:
+        pool = draw_pool(workers)
+    try:
+        bounds = [num_players * i // workers for i in range(workers + 1)]
+        counts = list(pool.map(_scatter_chunk, [
+            (src_shm.name, bounds[i], bounds[i + 1], workers, scatter_seeds[i])
+            for i in range(workers)]))
+
+        jobs = []
+        for bucket in range(workers):
+            segments = []
+            for chunk in range(workers):
+                start = bounds[chunk] + sum(counts[chunk][:bucket])
+                segments.append((start, counts[chunk][bucket]))
+            jobs.append((src_shm.name, succ_shm.name, segments, shuffle_seeds[bucket]))
+        paths = [path for path in pool.map(_link_bucket, jobs) if path is not None]
+
+        succ = succ_shm.buf.cast(INDEX_TYPE)
+        try:
+            # the buckets in order form the shuffle, close it into one cycle
+            for (_, last), (first, _) in zip(paths, paths[1:] + paths[:1]):
+                succ[last] = first
+            return dict(zip(players, map(players.__getitem__, succ)))
+        finally:
+            succ.release()
+    finally:
+        if own_pool:
+            pool.shutdown()
+        src_shm.close()
+        src_shm.unlink()
+        succ_shm.close()
+        succ_shm.unlink()
@@ -0,0 +1,95 @@
+"""Hot tier of the Secret Santa data store"""
+from itertools import chain
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from src.models import Event
+
+NUM_SHARDS = 256
+
+
+class SSSnapshot(Mapping[str, Event]):
+    """Read only view of the hot tier at one point in time"""
+    __slots__ = ("shards", "size")
+
+    def __init__(self, shards: Tuple[Dict[str, Event], ...], size: int):
+        self.shards = shards
+        self.size = size
+
+    def __getitem__(self, event_id: str) -> Event:
+        return self.shards[hash(event_id) % NUM_SHARDS][event_id]
+
+    def __contains__(self, event_id: object) -> bool:
+        return event_id in self.shards[hash(event_id) % NUM_SHARDS]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over the ids in creation order
+
+        Ids are decimal numbers handed out in increasing order. Every shard
+        is mostly in that order already, which the sort makes use of.
+        """
+        return iter(sorted(chain.from_iterable(self.shards), key=int))
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class SSHotTier:
+    """In-memory events split over copy-on-write shards
+
+    A snapshot freezes the current shards in O(NUM_SHARDS). Afterwards the
+    first write to a shard copies that shard only, so a snapshot costs at
+    most one copy of the store in total, spread over NUM_SHARDS writes.
+    Reads need no lock, writes must hold the lock of the owning store.
+    """
+
+    def __init__(self):
+        self.shards: List[Dict[str, Event]] = [{} for _ in range(NUM_SHARDS)]
+        # a shard may be written in place when it was copied in this generation
+        self.owners: List[int] = [0] * NUM_SHARDS
+        self.generation = 0
+        self.size = 0
+
+    def __writable(self, event_id: str) -> Dict[str, Event]:
+        """Returns the shard of the event, copied if a snapshot holds it"""
+        index = hash(event_id) % NUM_SHARDS
+        if self.owners[index] != self.generation:
+            self.shards[index] = dict(self.shards[index])
+            self.owners[index] = self.generation
+        return self.shards[index]
+
+    def get(self, event_id: str, default: Optional[Event] = None) -> Optional[Event]:
+        """Returns the event or default"""
+        return self.shards[hash(event_id) % NUM_SHARDS].get(event_id, default)
+
+    def __getitem__(self, event_id: str) -> Event:
+        return self.shards[hash(event_id) % NUM_SHARDS][event_id]
+
+    def __contains__(self, event_id: str) -> bool:
+        return event_id in self.shards[hash(event_id) % NUM_SHARDS]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def set(self, event: Event) -> None:
+        """Stores the event"""
+        shard = self.__writable(event.event_id)
+        if event.event_id not in shard:
+            self.size += 1
+        shard[event.event_id] = event
+
+    def pop(self, event_id: str) -> Event:
+        """Removes and returns the event"""
+        event = self.__writable(event_id).pop(event_id)
+        self.size -= 1
+        return event
+
+    def clear(self) -> None:
+        """Removes every event, leaving snapshots untouched"""
+        self.shards = [{} for _ in range(NUM_SHARDS)]
+        self.owners = [self.generation] * NUM_SHARDS
+        self.size = 0
+
+    def snapshot(self) -> SSSnapshot:
+        """Freezes the current shards"""
+        self.generation += 1
+        return SSSnapshot(tuple(self.shards), self.size)
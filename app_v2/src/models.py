@@ -22,6 +22,8 @@ class ConState(Enum):
     DELETE_EVENT=8
     REMOVE_PLAYER=10
     DISPLAY=11
+    AUDIT=12
+    REPEAT_EVENT=13
 
 @dataclass
 class Event:
@@ -32,4 +34,5 @@ class Event:
     event_status: EventStatus
     event_participants: List[str]
     event_santa_map: Dict[str, str]
-    event_location: str = ""
\ No newline at end of file
+    event_location: str = ""
+    event_previous_id: str = ""
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""Profiling of the Secret Santa application"""
+import time
+import pstats
+import cProfile
+import functools
+import inspect
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+class SSProfiler:
+    """Collects wall time, CPU time and allocations per label
+
+    Time spent waiting on the user is counted apart, so a label's busy time
+    is its wall time without the waits made inside it. A cProfile run covers
+    the whole session, including the threads started during it such as the
+    ones running draws, and is dumped next to the report as a pstats file
+    for flame graph tools.
+    """
+
+    def __init__(self, prefix: str = "ssapp_profile"):
+        self.prefix = prefix
+        self.profile = cProfile.Profile()
+        # label -> [calls, wall seconds, cpu seconds, net allocated bytes, wait seconds]
+        self.stats: Dict[str, List[float]] = {}
+        self.waited = 0.0
+        self.lock = threading.Lock()
+        # cProfile only follows the thread that enabled it, one per thread
+        self.thread_profiles: List[cProfile.Profile] = []
+
+    def __profile_thread(self, *_) -> None:
+        """Starts profiling a new thread, called once as its profile function"""
+        profile = cProfile.Profile()
+        with self.lock:
+            self.thread_profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        """start profiling"""
+        tracemalloc.start()
+        threading.setprofile(self.__profile_thread)
+        self.profile.enable()
+
+    def stop(self):
+        """stop profiling and write the report"""
+        self.profile.disable()
+        threading.setprofile(None)
+        # leave out the bookkeeping of the profiler itself
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ))
+        top_allocations = snapshot.statistics("lineno")[:10]
+        tracemalloc.stop()
+        stats = pstats.Stats(self.profile)
+        with self.lock:
+            for profile in self.thread_profiles:
+                profile.disable()
+                stats.add(profile)
+        stats.dump_stats(f"{self.prefix}.pstats")
+        with open(f"{self.prefix}.txt", "w", encoding="utf-8") as file:
+            file.write(self.report())
+            file.write("\nTop allocation sites\n")
+            for stat in top_allocations:
+                file.write(f"{stat}\n")
+
+    @contextmanager
+    def measure(self, label: str) -> Iterator[None]:
+        """measure the code run inside the context under label"""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        mem = tracemalloc.get_traced_memory()[0]
+        waited = self.waited
+        try:
+            yield
+        finally:
+            with self.lock:
+                stats = self.stats.setdefault(label, [0, 0.0, 0.0, 0, 0.0])
+                stats[0] += 1
+                stats[1] += time.perf_counter() - wall
+                stats[2] += time.process_time() - cpu
+                stats[3] += tracemalloc.get_traced_memory()[0] - mem
+                stats[4] += self.waited - waited
+
+    @contextmanager
+    def wait(self, label: str) -> Iterator[None]:
+        """measure the code run inside the context as waiting on the user"""
+        with self.measure(label):
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.waited += time.perf_counter() - start
+
+    def instrument(self, obj: Any, prefix: str, waiting: Optional[str] = None) -> Any:
+        """returns a proxy measuring every method call of obj
+
+        Methods whose name starts with waiting count as waiting on the user.
+        """
+        return _SSInstrumented(self, obj, prefix, waiting)
+
+    def report(self) -> str:
+        """returns the per label report sorted by busy time"""
+        lines = [f"{'label':<32} {'calls':>7} {'wall(s)':>10} {'wait(s)':>10} "
+                 f"{'busy(s)':>10} {'cpu(s)':>10} {'alloc(B)':>12}"]
+        for label, (calls, wall, cpu, mem, wait) in sorted(
+                self.stats.items(), key=lambda item: item[1][4] - item[1][1]):
+            lines.append(f"{label:<32} {calls:>7} {wall:>10.4f} {wait:>10.4f} "
+                         f"{wall - wait:>10.4f} {cpu:>10.4f} {mem:>12}")
+        return "\n".join(lines) + "\n"
+
+
+class _SSInstrumented:
+    """Proxy that measures the method calls of the wrapped object
+
+    The wrapper of a method is built on first access and then stored on the
+    proxy, so later accesses find it without going through __getattr__.
+    """
+
+    def __init__(self, profiler: SSProfiler, obj: Any, prefix: str,
+                 waiting: Optional[str] = None):
+        self._profiler = profiler
+        self._obj = obj
+        self._prefix = prefix
+        self._waiting = waiting
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._obj, name)
+        if not callable(attr):
+            return attr
+        label = f"{self._prefix}.{name}"
+        if self._waiting is not None and name.startswith(self._waiting):
+            measure = functools.partial(self._profiler.wait, label)
+        else:
+            measure = functools.partial(self._profiler.measure, label)
+
+        if inspect.iscoroutinefunction(attr):
+            @functools.wraps(attr)
+            async def async_wrapper(*args, **kwargs):
+                with measure():
+                    return await attr(*args, **kwargs)
+            wrapped = async_wrapper
+        else:
+            @functools.wraps(attr)
+            def wrapper(*args, **kwargs):
+                with measure():
+                    return attr(*args, **kwargs)
+            wrapped = wrapper
+        setattr(self, name, wrapped)
+        return wrapped
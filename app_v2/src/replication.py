@@ -0,0 +1,377 @@
+"""Primary/replica log shipping for the Secret Santa data store
+
+The primary streams the mutation log of its SSDataStore as newline delimited
+JSON to every replica connected to its replication port. A replica starts
+from a full copy of the primary, applies the log to its own store and
+serves reads over its own port with the same line protocol.
+
+A replica (re)starts from a "reset" entry followed by a "put" for every
+event and a "synced" entry. Its version only moves to the primary's once
+"synced" arrives, so no read sees a half copied store as up to date. Events
+too large for one line are sent as a "put" line followed by "chunks" lines
+that carry their participants and santa map piece by piece.
+
+Requests are JSON objects with an "op" of "status", "get_event" or
+"get_player_secret_santa". Reads accept a "min_version" token, e.g. the
+primary's version from a "status" request made after a write, and wait
+until the replica has applied it, which gives read-your-writes.
+
+The protocol has no authentication and is meant for local sockets only.
+"""
+import math
+import time
+import json
+import asyncio
+from dataclasses import fields
+from datetime import datetime
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.models import Event, EventStatus
+from src.store import SSDataStore
+from src.exceptions import EventNotFoundException, PlayerNotFoundException
+
+LINE_LIMIT = 2 ** 26
+CHUNK_SIZE = 2 ** 20
+COPY_BATCH = 1024
+HEARTBEAT_INTERVAL = 1.0
+
+
+def encode_event(event: Event) -> Dict[str, Any]:
+    """Converts an event to a JSON compatible dict"""
+    data = {field.name: getattr(event, field.name) for field in fields(Event)}
+    data["event_date_time"] = event.event_date_time.isoformat()
+    data["event_status"] = event.event_status.name
+    return data
+
+
+def decode_event(data: Dict[str, Any]) -> Event:
+    """Converts a dict made by encode_event back to an event"""
+    data = dict(data)
+    data["event_date_time"] = datetime.fromisoformat(data["event_date_time"])
+    data["event_status"] = EventStatus[data["event_status"]]
+    return Event(**data)
+
+
+def _encode_entry(version: int, op: str, payload: Any) -> bytes:
+    """Encodes a mutation log entry as one line, or more for a large event"""
+    entry: Dict[str, Any] = {"version": version, "op": op, "time": time.time()}
+    if op == "put":
+        entry["event"] = encode_event(payload)
+    elif op == "delete":
+        entry["event_id"] = payload
+    line = json.dumps(entry)
+    if len(line) > CHUNK_SIZE and op == "put":
+        return _encode_chunked(entry)
+    return (line + "\n").encode()
+
+
+def _encode_chunked(entry: Dict[str, Any]) -> bytes:
+    """Encodes a put as a head line and chunk lines of at most about CHUNK_SIZE"""
+    event = entry["event"]
+    fields_items = {"event_participants": event["event_participants"],
+                    "event_santa_map": list(event["event_santa_map"].items())}
+    event["event_participants"] = []
+    event["event_santa_map"] = {}
+    chunks: List[str] = []
+    for field, items in fields_items.items():
+        start = 0
+        size = 0
+        for end, item in enumerate(items):
+            size += len(json.dumps(item)) + 2
+            if size > CHUNK_SIZE and end > start:
+                chunks.append(json.dumps({"field": field, "items": items[start:end]}))
+                start = end
+                size = len(json.dumps(item)) + 2
+        if start < len(items):
+            chunks.append(json.dumps({"field": field, "items": items[start:]}))
+    entry["chunks"] = len(chunks)
+    return "".join(f"{line}\n" for line in [json.dumps(entry), *chunks]).encode()
+
+
+async def _read_entry(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """Reads a mutation log entry and its chunks, None at the end of the log"""
+    line = await reader.readline()
+    if not line:
+        return None
+    entry = json.loads(line)
+    for _ in range(entry.pop("chunks", 0)):
+        # a missing chunk reads as b"", which fails to decode like a bad line
+        chunk = json.loads(await reader.readline())
+        target = entry["event"][chunk["field"]]
+        if isinstance(target, dict):
+            target.update(chunk["items"])
+        else:
+            target.extend(chunk["items"])
+    return entry
+
+
+def _request_error(request: Any) -> Optional[str]:
+    """Returns why a read request is malformed, or None"""
+    if not isinstance(request, dict):
+        return "a request must be a JSON object"
+    min_version = request.get("min_version", 0)
+    if isinstance(min_version, bool) or not isinstance(min_version, int) or min_version < 0:
+        return "min_version must be a non-negative integer"
+    timeout = request.get("timeout", 5.0)
+    if (isinstance(timeout, bool) or not isinstance(timeout, (int, float))
+            or not math.isfinite(timeout) or timeout <= 0):
+        return "timeout must be a positive number of seconds"
+    event_id = request.get("event_id", "")
+    if isinstance(event_id, bool) or not isinstance(event_id, (str, int)):
+        return "event_id must be a string"
+    if not isinstance(request.get("player", ""), str):
+        return "player must be a string"
+    return None
+
+
+async def _send(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    """Writes a message as a line"""
+    writer.write((json.dumps(message) + "\n").encode())
+    await writer.drain()
+
+
+class SSReplicationPrimary:
+    """Ships the mutation log of a store to its replicas
+
+    Writers may run in any thread. Their entries are handed to the event
+    loop in version order, since the store publishes under its lock, and
+    are only encoded there when a replica needs them. Events are never
+    modified, so encoding them later is safe.
+    """
+
+    def __init__(self, store: SSDataStore, host: str = "127.0.0.1", port: int = 8024):
+        self.store = store
+        self.host = host
+        self.port = port
+        # queue of every replica -> version of the copy it started from
+        self.replicas: Dict["asyncio.Queue[bytes]", int] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        store.add_listener(self.publish)
+
+    def publish(self, version: int, op: str, payload: Any) -> None:
+        """Hands a mutation log entry to the event loop, from any thread"""
+        # always hand it over, a replica may be registering in the loop right now
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.enqueue, version, op, payload)
+
+    def enqueue(self, version: int, op: str, payload: Any) -> None:
+        """Queues an entry for every replica that does not have it yet"""
+        line = None
+        for queue, start_version in self.replicas.items():
+            if version > start_version:
+                if line is None:
+                    line = _encode_entry(version, op, payload)
+                queue.put_nowait(line)
+
+    def encode_copy(self, version: int, hot: Iterable[Event],
+                    cold_ids: Iterable[str]) -> bytes:
+        """Encodes puts for the hot events and the archived ones, in a thread"""
+        events = chain(hot, map(self.store.cold.load, cold_ids))
+        return b"".join(_encode_entry(version, "put", event)
+                        for event in events if event is not None)
+
+    async def replicate(self, writer: asyncio.StreamWriter) -> None:
+        """Sends a copy of the store followed by the live mutation log
+
+        The copy is loaded and encoded in batches off the loop, and every
+        batch is drained before the next one.
+        """
+        queue: "asyncio.Queue[bytes]" = asyncio.Queue()
+        # read the version before the copy, entries after it are sent again
+        # and no entry can reach the loop before the queue is registered
+        version = self.store.version
+        snapshot = self.store.snapshot()
+        cold_ids = list(self.store.cold)
+        self.replicas[queue] = version
+        try:
+            writer.write(_encode_entry(version, "reset", None))
+            hot_ids = list(snapshot)
+            for start in range(0, len(hot_ids), COPY_BATCH):
+                hot = [snapshot[event_id] for event_id in hot_ids[start:start + COPY_BATCH]]
+                writer.write(await asyncio.to_thread(self.encode_copy, version, hot, ()))
+                await writer.drain()
+            for start in range(0, len(cold_ids), COPY_BATCH):
+                writer.write(await asyncio.to_thread(self.encode_copy, version, (),
+                                                     cold_ids[start:start + COPY_BATCH]))
+                await writer.drain()
+            writer.write(_encode_entry(version, "synced", None))
+            await writer.drain()
+            while True:
+                try:
+                    line = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    line = _encode_entry(self.store.version, "heartbeat", None)
+                writer.write(line)
+                await writer.drain()
+        finally:
+            self.replicas.pop(queue, None)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """handles a replica or a status request"""
+        try:
+            request = json.loads(await reader.readline() or "{}")
+            if not isinstance(request, dict):
+                await _send(writer, {"ok": False, "error": "a request must be a JSON object"})
+            elif request.get("op") == "subscribe":
+                await self.replicate(writer)
+            else:
+                await _send(writer, {"ok": True, "version": self.store.version,
+                                     "replicas": len(self.replicas)})
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """accept replicas until cancelled"""
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self.handle, self.host, self.port,
+                                            limit=LINE_LIMIT)
+        async with server:
+            await server.serve_forever()
+
+
+class SSReplica:
+    """Read only copy of a primary store"""
+
+    def __init__(self, primary_host: str, primary_port: int,
+                 host: str = "127.0.0.1", port: int = 8025,
+                 store: Optional[SSDataStore] = None):
+        self.primary_host = primary_host
+        self.primary_port = primary_port
+        self.host = host
+        self.port = port
+        self.store = store if store is not None else SSDataStore()
+        self.head_version = 0
+        # true while a copy of the primary is coming in
+        self.syncing = False
+        self.applied_time = 0.0
+        self.head_time = 0.0
+        self.applied = asyncio.Condition()
+
+    def lag(self) -> Dict[str, float]:
+        """Returns how far the replica is behind the primary"""
+        versions = max(self.head_version - self.store.version, 0)
+        return {
+            "versions": versions,
+            "seconds": max(self.head_time - self.applied_time, 0.0) if versions else 0.0,
+        }
+
+    async def follow(self):
+        """applies the log of the primary, reconnecting when it goes away"""
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(
+                    self.primary_host, self.primary_port, limit=LINE_LIMIT)
+            except OSError:
+                await asyncio.sleep(HEARTBEAT_INTERVAL)
+                continue
+            try:
+                await _send(writer, {"op": "subscribe"})
+                while (entry := await _read_entry(reader)) is not None:
+                    self.apply(entry)
+                    async with self.applied:
+                        self.applied.notify_all()
+            except ConnectionError:
+                pass
+            except (ValueError, KeyError, TypeError) as err:
+                # over long or malformed lines, start again from a fresh copy
+                print(f"Resyncing with the primary after {err!r}")
+            finally:
+                writer.close()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def apply(self, entry: Dict[str, Any]) -> None:
+        """applies one entry of the primary's log
+
+        Until the "synced" entry of a copy, the store stays at version 0.
+        """
+        op = entry["op"]
+        self.head_time = entry["time"]
+        if op == "reset":
+            # the primary may have restarted with a lower version
+            self.head_version = entry["version"]
+            self.syncing = True
+            self.applied_time = entry["time"]
+        else:
+            self.head_version = max(self.head_version, entry["version"])
+        if op == "heartbeat":
+            return
+        if op == "synced":
+            self.syncing = False
+        version = 0 if self.syncing else entry["version"]
+        if op == "put":
+            self.store.apply(version, "put", decode_event(entry["event"]))
+        elif op == "delete":
+            self.store.apply(version, "delete", entry["event_id"])
+        else:
+            self.store.apply(version, op, None)
+        if not self.syncing:
+            self.applied_time = entry["time"]
+
+    async def read(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """answers a read request"""
+        error = _request_error(request)
+        if error is not None:
+            return {"ok": False, "error": error, "version": self.store.version}
+        op = request.get("op")
+        if op == "status":
+            return {"ok": True, "version": self.store.version, "lag": self.lag(),
+                    "syncing": self.syncing,
+                    "metrics": self.store.get_metrics()}
+        min_version = request.get("min_version", 0)
+        if self.store.version < min_version:
+            try:
+                async with self.applied:
+                    await asyncio.wait_for(
+                        self.applied.wait_for(lambda: self.store.version >= min_version),
+                        request.get("timeout", 5.0))
+            except asyncio.TimeoutError:
+                return {"ok": False, "error": f"{min_version=} not replicated yet",
+                        "version": self.store.version}
+        event_id = str(request.get("event_id", ""))
+        try:
+            if op == "get_event":
+                event = self.store.get_event(event_id)
+                if event is None:
+                    raise EventNotFoundException(event_id)
+                return {"ok": True, "version": self.store.version,
+                        "event": encode_event(event)}
+            if op == "get_player_secret_santa":
+                santa = self.store.get_player_secret_santa(event_id, request.get("player", ""))
+                return {"ok": True, "version": self.store.version, "santa": santa}
+        except (EventNotFoundException, PlayerNotFoundException) as err:
+            return {"ok": False, "error": err.msg, "version": self.store.version}
+        return {"ok": False, "error": f"{op=} is not a read operation"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """answers the read requests of a connection"""
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    await _send(writer, {"ok": False, "error": "invalid request"})
+                    continue
+                await _send(writer, await self.read(request))
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """follow the primary and serve reads until cancelled"""
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.follow(),
+                                 self.store.archive_periodically())
+
+    def run(self):
+        """run the replica"""
+        print(f"Replicating {self.primary_host}:{self.primary_port}, "
+              f"serving reads on {self.host}:{self.port}")
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.store.close()
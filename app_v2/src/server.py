@@ -0,0 +1,67 @@
+"""Socket front end of the Secret Santa application"""
+import asyncio
+import traceback
+from typing import Optional
+
+from src.view import SSCli
+from src.store import SSDataStore
+from src.session import SSSession
+from src.replication import SSReplicationPrimary
+
+class SSServer:
+    """Serves one SSSession per connection on top of a shared SSDataStore"""
+
+    def __init__(self, store: Optional[SSDataStore] = None,
+                 host: str = "127.0.0.1", port: int = 8023,
+                 replication_port: Optional[int] = None,
+                 draw_workers: int = 1):
+        self.store = store if store is not None else SSDataStore(draw_workers=draw_workers)
+        self.host = host
+        self.port = port
+        self.num_sessions = 0
+        self.primary = None
+        if replication_port is not None:
+            self.primary = SSReplicationPrimary(self.store, host, replication_port)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """runs a session for a new connection"""
+        self.num_sessions += 1
+        cli = SSCli(reader, writer)
+        try:
+            await SSSession(cli, self.store).run()
+            await writer.drain()
+        except ConnectionError:
+            pass
+        except Exception as err:
+            traceback.print_exc()
+            try:
+                cli.dis_error(f"Unexpected error, closing the session: {err!r}")
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            self.num_sessions -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self):
+        """accept connections until cancelled"""
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        async with server:
+            tasks = [server.serve_forever(), self.store.archive_periodically()]
+            if self.primary is not None:
+                tasks.append(self.primary.serve())
+            await asyncio.gather(*tasks)
+
+    def run(self):
+        """run the server"""
+        print(f"Serving Secret Santa on {self.host}:{self.port}")
+        if self.primary is not None:
+            print(f"Shipping the mutation log on {self.host}:{self.primary.port}")
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.store.close()
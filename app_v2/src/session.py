@@ -0,0 +1,276 @@
+"""Per user session of the Secret Santa application"""
+import random
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from src.models import ConState
+from src.view import SSCli
+from src.store import SSDataStore
+from src.profiler import SSProfiler
+from src.exceptions import EventNotFoundException, PlayerNotFoundException, QuitException
+
+class SSSession:
+    """State machine for a single user
+
+    Sessions only hold the input buffer of their user, so many of them can
+    share one SSDataStore inside the same asyncio loop.
+    """
+    __slots__ = ("con_state", "cli", "store", "player", "event_id", "event_name",
+                 "event_time", "event_status", "event_location", "event_participants",
+                 "profiler")
+
+    STATE_HANDLERS: Dict[ConState, str] = {
+        ConState.MAIN: "on_main",
+        ConState.EVENTS: "on_events",
+        ConState.DELETE_EVENT: "on_delete_event",
+        ConState.GET_EVENT: "on_get_event",
+        ConState.ADD_PLAYER: "on_add_player",
+        ConState.REMOVE_PLAYER: "on_remove_player",
+        ConState.CLOSE_EVENT: "on_close_event",
+        ConState.NEW_EVENT: "on_new_event",
+        ConState.REPEAT_EVENT: "on_repeat_event",
+        ConState.SS_EVENT: "on_ss_event",
+        ConState.DISPLAY: "on_display",
+        ConState.QUIT: "on_quit",
+        ConState.AUDIT: "on_audit",
+    }
+
+    def __init__(self, cli: SSCli, store: SSDataStore,
+                 profiler: Optional[SSProfiler] = None):
+        self.con_state = ConState.MAIN
+        self.cli = cli
+        self.store = store
+        self.profiler = profiler
+
+        self.player = ""
+        self.event_id = ""
+        self.event_name = ""
+        self.event_time = ""
+        self.event_status: Optional[bool] = None
+        self.event_location: Optional[str] = None
+        self.event_participants: Optional[List[str]] = None
+
+    def clear_input_buffer(self):
+        """Clears the input buffer"""
+        self.player = ""
+        self.event_id = ""
+        self.event_name = ""
+        self.event_time = ""
+        self.event_status = None
+        self.event_location = None
+        self.event_participants = None
+
+    def validate_main_input(self, choice: str) -> ConState:
+        """validate the main input"""
+        choice_to_conv_state = {
+            "n": ConState.NEW_EVENT,
+            "e": ConState.REPEAT_EVENT,
+            "g": ConState.GET_EVENT,
+            "a": ConState.ADD_PLAYER,
+            "r": ConState.REMOVE_PLAYER,
+            "c": ConState.CLOSE_EVENT,
+            "d": ConState.DELETE_EVENT,
+            "s": ConState.SS_EVENT,
+            "q": ConState.QUIT,
+            "l": ConState.EVENTS,
+            "v": ConState.AUDIT,
+        }
+
+        if choice not in choice_to_conv_state:
+            self.cli.invalid_input_msg()
+            return self.con_state
+        return choice_to_conv_state[choice]
+
+    def validate_global(self, choice: str) -> ConState:
+        """Only can go to some values"""
+        choice_to_gol_state = {
+            "m": ConState.MAIN,
+            "q": ConState.QUIT,
+            "l": ConState.EVENTS
+        }
+
+        if choice in choice_to_gol_state:
+            return choice_to_gol_state[choice]
+        return ConState.MAIN
+
+    async def on_main(self):
+        """main menu"""
+        self.cli.clear_screen()
+        self.cli.dis_header_message()
+        choice = await self.cli.get_main_choices()
+        self.con_state = self.validate_main_input(choice)
+
+    async def on_events(self):
+        """list the events"""
+        self.cli.clear_screen()
+        events = self.store.get_events()
+        self.cli.dis_events(events)
+        self.con_state = ConState.DISPLAY
+
+    async def on_delete_event(self):
+        """delete an event"""
+        if self.event_id == "":
+            self.cli.clear_screen()
+            self.event_id = await self.cli.get_event_id()
+        else:
+            self.store.cancel_event(self.event_id)
+            self.cli.dis_cancel_event_msg(self.event_id)
+            self.con_state = ConState.DISPLAY
+            self.clear_input_buffer()
+
+    async def on_get_event(self):
+        """display an event"""
+        if self.event_id == "":
+            self.cli.clear_screen()
+            self.event_id = await self.cli.get_event_id()
+        else:
+            event = self.store.get_event(self.event_id)
+            if event:
+                self.cli.dis_event_info(event)
+            else:
+                self.cli.dis_event_not_found(self.event_id)
+            self.con_state = ConState.DISPLAY
+            self.clear_input_buffer()
+
+    async def on_add_player(self):
+        """add a player to an event"""
+        if self.event_id == "":
+            self.cli.clear_screen()
+            self.event_id = await self.cli.get_event_id()
+        elif self.player == "":
+            self.player = await self.cli.get_player_name()
+        else:
+            try:
+                self.store.add_player(self.event_id, self.player)
+                self.cli.dis_event_info(self.store.get_event(self.event_id))
+                self.cli.dis_event_update_msg(self.event_id)
+            except EventNotFoundException as err:
+                self.cli.dis_error(err.msg)
+            except ValueError as _:
+                self.cli.dis_event_close_msg(self.event_id)
+            self.clear_input_buffer()
+            self.con_state = ConState.DISPLAY
+
+    async def on_remove_player(self):
+        """remove a player from an event"""
+        if self.event_id == "":
+            self.cli.clear_screen()
+            self.event_id = await self.cli.get_event_id()
+        elif self.player == "":
+            self.player = await self.cli.get_player_name()
+        else:
+            try:
+                self.store.remove_player(self.event_id, self.player)
+                self.cli.dis_event_info(self.store.get_event(self.event_id))
+                self.cli.dis_event_update_msg(self.event_id)
+            except EventNotFoundException as err:
+                self.cli.dis_error(err.msg)
+            except ValueError as _:
+                self.cli.dis_event_close_msg(self.event_id)
+            self.clear_input_buffer()
+            self.con_state = ConState.DISPLAY
+
+    async def on_close_event(self):
+        """close an event"""
+        if self.event_id == "":
+            self.cli.clear_screen()
+            self.event_id = await self.cli.get_event_id()
+        else:
+            try:
+                # large draws run in a thread so other sessions keep going
+                await asyncio.to_thread(self.store.close_event, self.event_id)
+                self.cli.dis_event_close_msg(self.event_id)
+            except EventNotFoundException as err:
+                self.cli.dis_error(err.msg)
+            except ValueError as err:
+                self.cli.dis_error(str(err))
+            self.con_state = ConState.DISPLAY
+            self.event_id = ""
+
+    async def on_new_event(self):
+        """create an event"""
+        if self.event_name == "":
+            self.cli.clear_screen()
+            self.event_name = await self.cli.get_event_name()
+        elif self.event_location is None:
+            self.event_location = await self.cli.get_location()
+        elif self.event_participants is None:
+            self.event_participants = await self.cli.get_players()
+        elif self.event_status is None:
+            self.event_status = await self.cli.get_event_status()
+        else:
+            event_id = await asyncio.to_thread(self.store.create_event,
+                                               self.event_name,
+                                               datetime.now() + timedelta(
+                                                   minutes=random.randint(5, 15)),
+                                               self.event_participants,
+                                               not self.event_status,
+                                               self.event_location)
+            self.cli.dis_event_info(self.store.get_event(event_id))
+            self.clear_input_buffer()
+            self.con_state = ConState.DISPLAY
+
+    async def on_repeat_event(self):
+        """create the next occurrence of an event"""
+        if self.event_id == "":
+            self.cli.clear_screen()
+            self.event_id = await self.cli.get_event_id()
+        else:
+            try:
+                event_id = self.store.create_recurrence(self.event_id,
+                                                        datetime.now() + timedelta(
+                                                            minutes=random.randint(5, 15)))
+                self.cli.dis_event_info(self.store.get_event(event_id))
+            except EventNotFoundException as err:
+                self.cli.dis_error(err.msg)
+            self.clear_input_buffer()
+            self.con_state = ConState.DISPLAY
+
+    async def on_ss_event(self):
+        """display the secret santa of a player"""
+        if self.event_id == "":
+            self.event_id = await self.cli.get_event_id()
+        elif self.player == "":
+            self.player = await self.cli.get_player_name()
+        else:
+            try:
+                ss = self.store.get_player_secret_santa(self.event_id, self.player)
+                self.cli.dis_ss_message(self.event_id, self.player, ss)
+            except EventNotFoundException as err:
+                self.cli.dis_error(err.msg)
+            except PlayerNotFoundException as err:
+                self.cli.dis_error(err.msg)
+            self.clear_input_buffer()
+            self.con_state = ConState.DISPLAY
+
+    async def on_audit(self):
+        """audit the santa maps of every event"""
+        self.cli.clear_screen()
+        self.cli.dis_audit_report(await asyncio.to_thread(self.store.audit))
+        self.con_state = ConState.DISPLAY
+
+    async def on_display(self):
+        """wait for the user after displaying a result"""
+        res = await self.cli.get_global_choice()
+        self.con_state = self.validate_global(res)
+
+    async def on_quit(self):
+        """quit the session"""
+        self.cli.clear_screen()
+        raise QuitException("Terminate the session")
+
+    async def run(self):
+        """run the session until the user quits"""
+        try:
+            while True:
+                handler = self.STATE_HANDLERS.get(self.con_state)
+                if handler is None:
+                    self.con_state = ConState.MAIN
+                elif self.profiler is None:
+                    await getattr(self, handler)()
+                else:
+                    with self.profiler.measure(f"state.{self.con_state.name}"):
+                        await getattr(self, handler)()
+        except QuitException:
+            self.cli.clear_screen()
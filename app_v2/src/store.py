@@ -1,116 +1,426 @@
 import time
 import heapq
-import random
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Dict, Optional, Set, Tuple
 
+from src.archive import SSColdStore
+from src.audit import audit_events
+from src.hot import SSHotTier, SSSnapshot
+from src.draw import single_cycle_map, parallel_single_cycle_map, excluding_map, draw_pool
 from src.models import Event, EventStatus
 from src.exceptions import EventNotFoundException, PlayerNotFoundException
 
+ARCHIVE_INTERVAL = 60.0
+AUDIT_BATCH = 1024
 
 class SSDataStore:
     """SS Datastore implementation"""
-    def __init__(self):
-        """SS datastore"""
+    def __init__(self, cold: Optional[SSColdStore] = None,
+                 archive_after: timedelta = timedelta(days=30),
+                 draw_workers: int = 1,
+                 parallel_draw_threshold: int = 1_000_000,
+                 max_archived_records: int = 10_000):
+        """SS datastore
+
+        Events stay in the in-memory ``store`` until ``archive_events`` moves
+        the ones older than ``archive_after`` to the ``cold`` tier.
+        Events with at least ``parallel_draw_threshold`` participants are drawn
+        in a pool of ``draw_workers`` processes when more than one is given.
+        The pool lives until ``close``. Rosters never list a player twice.
+
+        Writers never modify a stored Event, they replace it. Together with
+        the copy-on-write shards of SSHotTier this lets ``snapshot`` hand out
+        a point in time view without copying the store.
+
+        Every write bumps ``version`` and is passed to the listeners as a
+        ``(version, op, payload)`` entry of the mutation log, where op is
+        "put" with the new Event or "delete" with the event id.
+
+        The last ``max_archived_records`` archived or recurred events keep
+        their name, location and roster in the ``archived`` LRU so they can
+        recur without a disk load, older ones recur from the cold tier. Equal
+        rosters share one list through the content addressed and reference
+        counted ``rosters`` table, so each distinct roster is kept once.
+
+        Santa maps are audited when their event is archived, so ``audit``
+        only loads the archived events it has never seen, the ones archived
+        before this process started or copied from a primary.
+        """
         self.num_events_created = 0
         self.unix_time = time.mktime(datetime.now().timetuple())
-        self.store: Dict[str, Event] = {}
+        self.store = SSHotTier()
         self.time_queue: List[Tuple[float, str]] = []
+        self.cold = cold if cold is not None else SSColdStore()
+        self.archive_after = archive_after
+        self.draw_workers = draw_workers
+        self.parallel_draw_threshold = parallel_draw_threshold
+        self.draw_pool = draw_pool(draw_workers) if draw_workers > 1 else None
+        self.lock = threading.Lock()
+        self.version = 0
+        self.listeners: List[Callable[[int, str, Any], None]] = []
+        self.max_archived_records = max_archived_records
+        # hash of a roster -> the list shared by the records holding it, and their count
+        self.rosters: Dict[int, Tuple[List[str], int]] = {}
+        # archived event id -> (name, location, roster), least recently used first
+        self.archived: "OrderedDict[str, Tuple[str, str, List[str]]]" = OrderedDict()
+        # archived event ids with an invalid santa map, and those not audited yet
+        self.invalid_archived: Set[str] = set()
+        self.unaudited: Set[str] = set(self.cold)
+
+    def __get_santa_map(self, players: List[str], seed: Optional[int] = None,
+                        exclude: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Returns a lookup map for secrete santa, avoiding the pairs in exclude"""
+        if self.draw_workers > 1 and len(players) >= self.parallel_draw_threshold:
+            def draw(draw_seed):
+                return parallel_single_cycle_map(players, self.draw_workers, draw_seed,
+                                                 self.draw_pool)
+        else:
+            def draw(draw_seed):
+                return single_cycle_map(players, draw_seed)
+        if exclude:
+            return excluding_map(draw, exclude, seed)
+        return draw(seed)
+
+    def __archive(self, event: Event) -> None:
+        """Keeps what a recurrence of an archived event needs
+
+        Evicts the least recently used records beyond max_archived_records.
+        Must hold the lock.
+        """
+        self.__forget(event.event_id)
+        roster = event.event_participants
+        key = hash(tuple(roster))
+        shared, count = self.rosters.get(key, (roster, 0))
+        if shared is roster or shared == roster:
+            self.rosters[key] = (shared, count + 1)
+            roster = shared
+        self.archived[event.event_id] = (event.event_name, event.event_location, roster)
+        while len(self.archived) > self.max_archived_records:
+            self.__forget(next(iter(self.archived)))
+
+    def __forget(self, event_id: str) -> None:
+        """Drops the record of an archived event and its last roster reference
 
-    def __get_santa_map(self, players: List[str]) -> Dict[str, str]:
-        """Returns a lookup map for secrete santa"""
-        _lookup = {}
-        _choices = set(players)
-        for player in players:
-            remove_self = False
-            if player in _choices:
-                _choices.remove(player)
-                remove_self = True
-            pick = random.choice(list(_choices))
-            if remove_self:
-                _choices.add(player)
-            _choices.remove(pick)
-            _lookup[player] = pick
-        return _lookup
+        Must hold the lock.
+        """
+        record = self.archived.pop(event_id, None)
+        if record is None:
+            return
+        roster = record[2]
+        key = hash(tuple(roster))
+        shared, count = self.rosters.get(key, (None, 0))
+        if shared is roster:
+            if count > 1:
+                self.rosters[key] = (shared, count - 1)
+            else:
+                del self.rosters[key]
+
+    def __publish(self, op: str, payload: Any) -> None:
+        """Logs a write to the listeners, must hold the lock"""
+        self.version += 1
+        for listener in self.listeners:
+            listener(self.version, op, payload)
+
+    def __put(self, event: Event) -> None:
+        """Stores the event in the hot tier, must hold the lock"""
+        self.store.set(event)
+        self.__publish("put", event)
+
+    def add_listener(self, listener: Callable[[int, str, Any], None]) -> None:
+        """Subscribes to the mutation log of the store"""
+        with self.lock:
+            self.listeners.append(listener)
+
+    def snapshot(self) -> SSSnapshot:
+        """Returns a read only point in time view of the hot tier"""
+        with self.lock:
+            return self.store.snapshot()
 
     def get_events(self) -> List[Event]:
-        """returns the list of events stored"""
-        return self.store.values()
+        """returns the list of events in the hot tier"""
+        return self.snapshot().values()
+
+    def archive_events(self, now: Optional[datetime] = None) -> int:
+        """Moves events older than archive_after to the cold tier
+
+        Open events that get archived are marked as expired. The files are
+        written without the lock, an event replaced or cancelled meanwhile
+        stays where the writer left it and is archived on a later run.
+        Returns the number of archived events.
+        """
+        now = now if now is not None else datetime.now()
+        cutoff = time.mktime((now - self.archive_after).timetuple())
+        due: List[Tuple[float, Event]] = []
+        with self.lock:
+            while self.time_queue and self.time_queue[0][0] <= cutoff:
+                date_time_float, event_id = heapq.heappop(self.time_queue)
+                if event_id in self.store:
+                    due.append((date_time_float, self.store[event_id]))
+
+        archived: List[Tuple[float, Event, Event]] = []
+        for date_time_float, event in due:
+            cold_event = event
+            if event.event_status is EventStatus.OPEN:
+                cold_event = replace(event, event_status=EventStatus.EXPIRED)
+            self.cold.archive(cold_event)
+            archived.append((date_time_float, event, cold_event))
+        invalid = set(audit_events(cold_event for _, _, cold_event in archived))
+
+        num_archived = 0
+        with self.lock:
+            for date_time_float, event, cold_event in archived:
+                current = self.store.get(event.event_id)
+                if current is not event:
+                    self.cold.remove(event.event_id)
+                    if current is not None:
+                        heapq.heappush(self.time_queue, (date_time_float, event.event_id))
+                    continue
+                self.__archive(cold_event)
+                if event.event_id in invalid:
+                    self.invalid_archived.add(event.event_id)
+                self.store.pop(event.event_id)
+                if cold_event is not event:
+                    self.__publish("put", cold_event)
+                num_archived += 1
+        return num_archived
+
+    async def archive_periodically(self, interval: float = ARCHIVE_INTERVAL) -> None:
+        """Archives old events in a thread every interval seconds until cancelled"""
+        while True:
+            await asyncio.to_thread(self.archive_events)
+            await asyncio.sleep(interval)
+
+    def audit(self) -> List[str]:
+        """Returns the ids of the events with an invalid santa map
+
+        The hot tier is audited from a snapshot. Archived events are loaded in
+        batches of AUDIT_BATCH without the lock, and only if never audited.
+        """
+        with self.lock:
+            snapshot = self.store.snapshot()
+            unaudited = self.unaudited
+            pending = list(unaudited)
+        invalid = audit_events(snapshot.values())
+        for start in range(0, len(pending), AUDIT_BATCH):
+            batch = pending[start:start + AUDIT_BATCH]
+            events = map(self.cold.load, batch)
+            batch_invalid = audit_events(event for event in events if event is not None)
+            with self.lock:
+                # a reset meanwhile replaced the set and emptied the cold tier
+                if unaudited is self.unaudited:
+                    self.invalid_archived.update(
+                        event_id for event_id in batch_invalid if event_id in self.cold)
+                    unaudited.difference_update(batch)
+        with self.lock:
+            return invalid + sorted(self.invalid_archived, key=int)
+
+    def close(self) -> None:
+        """Releases the cold tier and the draw pool"""
+        self.cold.close()
+        if self.draw_pool is not None:
+            self.draw_pool.shutdown()
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Returns the tiering metrics of the store"""
+        return {"hot_events": len(self.store), **self.cold.metrics()}
 
 
     def create_event(self, name:str,
                      date_time: datetime,
                      participants: List[str],
                      close_event: bool = False,
-                     location: str = "") -> str:
+                     location: str = "",
+                     seed: Optional[int] = None) -> str:
         """Creates an event for our secret santa"""
 
-        _id = str(self.num_events_created)
+        participants = list(dict.fromkeys(participants))
         event_state = EventStatus.OPEN
         santa_map = {}
         if close_event:
-            santa_map = self.__get_santa_map(participants)
+            santa_map = self.__get_santa_map(participants, seed)
             event_state = EventStatus.CLOSED
-        event = Event(_id, name, date_time, event_state, participants, santa_map, location)
-        self.store[_id] = event
         date_time_float = time.mktime(date_time.timetuple())
-        heapq.heappush(self.time_queue, (date_time_float, _id))
-        self.num_events_created += 1
+        with self.lock:
+            _id = str(self.num_events_created)
+            event = Event(_id, name, date_time, event_state, participants,
+                          santa_map, location)
+            self.__put(event)
+            heapq.heappush(self.time_queue, (date_time_float, _id))
+            self.num_events_created += 1
+        return _id
+
+    def create_recurrence(self, event_id: str, date_time: datetime) -> str:
+        """Creates the next occurrence of an event
+
+        The new event shares the roster of the previous one until a player is
+        added or removed, and its draw avoids the pairs of the previous one.
+        """
+        previous = self.store.get(event_id)
+        with self.lock:
+            record = self.archived.get(event_id)
+            if record is not None:
+                self.archived.move_to_end(event_id)
+        if previous is not None:
+            name, location, roster = (previous.event_name, previous.event_location,
+                                      previous.event_participants)
+        elif record is not None:
+            name, location, roster = record
+        else:
+            # evicted from the records, or archived before this process started
+            previous = self.cold.get(event_id)
+            if previous is None:
+                raise EventNotFoundException(event_id)
+            name, location, roster = (previous.event_name, previous.event_location,
+                                      previous.event_participants)
+        date_time_float = time.mktime(date_time.timetuple())
+        with self.lock:
+            _id = str(self.num_events_created)
+            self.__put(Event(_id, name, date_time, EventStatus.OPEN,
+                             roster, {}, location, event_id))
+            heapq.heappush(self.time_queue, (date_time_float, _id))
+            self.num_events_created += 1
         return _id
 
     def get_event(self, event_id: str) -> Optional[Event]:
         """Get the event info"""
 
-        if event_id in self.store:
-            return self.store[event_id]
-        return None
+        event = self.store.get(event_id)
+        if event is not None:
+            return event
+        return self.cold.get(event_id)
 
     def add_player(self, event_id: str, player: str):
         """adding a player to the game"""
 
-        if event_id not in self.store:
-            raise EventNotFoundException(event_id)
-        elif self.store[event_id].event_status is not EventStatus.OPEN:
-            raise ValueError(f"{event_id=} is no longer accepting players")
-        else:
-            self.store[event_id].event_participants.append(player)
-
-    def close_event(self, event_id: str) -> None:
-        """updates the status of the event to closed"""
-
-        if event_id not in self.store:
-            raise EventNotFoundException(event_id)
-        elif self.store[event_id].event_status is EventStatus.EXPIRED:
-            raise ValueError(f"{event_id=} has expired and cannot be closed")
-        elif self.store[event_id].event_status is EventStatus.OPEN:
-            self.store[event_id].event_santa_map = self.__get_santa_map(
-                self.store[event_id].event_participants)
-            self.store[event_id].event_status = EventStatus.CLOSED
-        else:
-            pass
+        with self.lock:
+            if event_id not in self.store:
+                if event_id in self.cold:
+                    raise ValueError(f"{event_id=} is no longer accepting players")
+                raise EventNotFoundException(event_id)
+            elif self.store[event_id].event_status is not EventStatus.OPEN:
+                raise ValueError(f"{event_id=} is no longer accepting players")
+            else:
+                event = self.store[event_id]
+                if player not in event.event_participants:
+                    self.__put(replace(
+                        event, event_participants=event.event_participants + [player]))
+
+    def close_event(self, event_id: str, seed: Optional[int] = None,
+                    avoid_previous: bool = True) -> None:
+        """updates the status of the event to closed
+
+        For a recurring event the draw avoids the pairs of the previous
+        occurrence unless avoid_previous is False.
+        """
+
+        while True:
+            event = self.store.get(event_id)
+            if event is None:
+                event = self.cold.get(event_id)
+                if event is None:
+                    raise EventNotFoundException(event_id)
+                if event.event_status is EventStatus.EXPIRED:
+                    raise ValueError(f"{event_id=} has expired and cannot be closed")
+                return
+            elif event.event_status is EventStatus.EXPIRED:
+                raise ValueError(f"{event_id=} has expired and cannot be closed")
+            elif event.event_status is not EventStatus.OPEN:
+                return
+
+            # draw without the lock, and draw again if a writer got in first
+            exclude = None
+            if avoid_previous and event.event_previous_id:
+                previous = self.get_event(event.event_previous_id)
+                if previous is not None:
+                    exclude = previous.event_santa_map
+            santa_map = self.__get_santa_map(event.event_participants, seed, exclude)
+            with self.lock:
+                if self.store.get(event_id) is event:
+                    self.__put(replace(
+                        event, event_santa_map=santa_map, event_status=EventStatus.CLOSED))
+                    return
 
 
     def remove_player(self, event_id: str, player: str):
         """remove player from a game"""
-        if event_id not in self.store:
-            raise EventNotFoundException(event_id)
-        elif self.store[event_id].event_status is not EventStatus.OPEN:
-            raise ValueError(f"{event_id=} is no longer accepting players")
-        else:
-            if player in self.store[event_id].event_participants:
-                self.store[event_id].event_participants.remove(player)
+        with self.lock:
+            if event_id not in self.store:
+                if event_id in self.cold:
+                    raise ValueError(f"{event_id=} is no longer accepting players")
+                raise EventNotFoundException(event_id)
+            elif self.store[event_id].event_status is not EventStatus.OPEN:
+                raise ValueError(f"{event_id=} is no longer accepting players")
+            else:
+                event = self.store[event_id]
+                if player in event.event_participants:
+                    participants = list(event.event_participants)
+                    participants.remove(player)
+                    self.__put(replace(event, event_participants=participants))
 
     def get_player_secret_santa(self, event_id: str, user_name: str) -> str:
         """Get my secrete Santa Name"""
         # whether all player have unique names
 
-        if event_id in self.store:
-            if user_name in self.store[event_id].event_santa_map:
-                return self.store[event_id].event_santa_map[user_name]
+        event = self.get_event(event_id)
+        if event is not None:
+            if user_name in event.event_santa_map:
+                return event.event_santa_map[user_name]
             raise PlayerNotFoundException(event_id, user_name)
         raise EventNotFoundException(event_id)
 
     def cancel_event(self, event_id) -> None:
         """Deletes the Event from store"""
-        if event_id in self.store:
-            _ = self.store.pop(event_id)
\ No newline at end of file
+        with self.lock:
+            if event_id in self.store:
+                _ = self.store.pop(event_id)
+            elif event_id in self.cold:
+                self.cold.remove(event_id)
+                self.__forget(event_id)
+                self.invalid_archived.discard(event_id)
+                self.unaudited.discard(event_id)
+            else:
+                return
+            self.__publish("delete", event_id)
+
+    def apply(self, version: int, op: str, payload: Any) -> None:
+        """Applies an entry of another store's mutation log
+
+        Besides "put" and "delete", a "reset" entry empties the store and a
+        "synced" entry, which ends a full copy, only sets the version.
+        """
+        with self.lock:
+            if op == "reset":
+                self.store.clear()
+                self.time_queue = []
+                for event_id in list(self.cold):
+                    self.cold.remove(event_id)
+                self.rosters.clear()
+                self.archived.clear()
+                self.invalid_archived.clear()
+                self.unaudited = set()
+            elif op == "put":
+                if payload.event_id in self.store or payload.event_id not in self.cold:
+                    if payload.event_id not in self.store:
+                        date_time_float = time.mktime(payload.event_date_time.timetuple())
+                        heapq.heappush(self.time_queue, (date_time_float, payload.event_id))
+                    self.store.set(payload)
+                else:
+                    self.cold.archive(payload)
+                    self.__archive(payload)
+                    self.invalid_archived.discard(payload.event_id)
+                    self.unaudited.add(payload.event_id)
+            elif op == "delete":
+                if payload in self.store:
+                    _ = self.store.pop(payload)
+                else:
+                    self.cold.remove(payload)
+                    self.__forget(payload)
+                    self.invalid_archived.discard(payload)
+                    self.unaudited.discard(payload)
+            self.version = version
+            for listener in self.listeners:
+                listener(version, op, payload)
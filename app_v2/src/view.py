@@ -1,42 +1,76 @@
 import os
-from typing import List
+import asyncio
+from typing import List, Optional
 
 from src.models import Event
+from src.exceptions import QuitException
 
 class SSCli:
-    """SS cli implementation"""
-    def __init__(self):
+    """SS cli implementation
+
+    Talks to the terminal by default, or to a socket connection when a
+    reader and writer pair from asyncio is given.
+    """
+    def __init__(self, reader: Optional[asyncio.StreamReader] = None,
+                 writer: Optional[asyncio.StreamWriter] = None):
         self.name = self.__class__.__name__
+        self.reader = reader
+        self.writer = writer
+
+    def _print(self, *args):
+        """prints to the terminal or the connection"""
+        if self.writer is None:
+            print(*args)
+        else:
+            text = " ".join(str(arg) for arg in args) + "\n"
+            self.writer.write(text.replace("\n", "\r\n").encode())
+
+    async def _input(self, prompt: str) -> str:
+        """reads a line from the terminal or the connection"""
+        if self.reader is None:
+            # the terminal only ever has one session, blocking the loop is fine
+            return input(prompt)
+        self.writer.write(prompt.encode())
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise QuitException("Connection closed")
+        return line.decode(errors="replace").rstrip("\r\n")
 
     def invalid_input_msg(self):
         """prints the message to user for invalid input."""
-        print("\nInput that was entered is invalid.")
+        self._print("\nInput that was entered is invalid.")
 
     def clear_screen(self):
         """clears the terminal screen"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        if self.writer is None:
+            os.system('cls' if os.name == 'nt' else 'clear')
+        else:
+            self.writer.write(b"\x1b[2J\x1b[H")
 
     def dis_header_message(self):
         """Display the application header"""
-        print("\t**********************************************")
-        print("\t***    Welcome to the Secret Santa App     ***")
-        print("\t**********************************************")
+        self._print("\t**********************************************")
+        self._print("\t***    Welcome to the Secret Santa App     ***")
+        self._print("\t**********************************************")
 
-    def get_main_choices(self):
+    async def get_main_choices(self):
         """Prints the main menu and get the choice of the user."""
         # Let users know what they can do.
-        print("\n[l] See a list of events")
-        print("[n] Create a new event")
-        print("[g] Get event info")
-        print("[a] Add a player")
-        print("[r] Remove a player")
-        print("[c] Close an event")
-        print("[d] Delete an event")
-        print("[s] Get player's SS")
-        print("[m] Return to main")
-        print("[q] Quit")
-
-        return input("What would you like to do? ")
+        self._print("\n[l] See a list of events")
+        self._print("[n] Create a new event")
+        self._print("[e] Repeat an event")
+        self._print("[g] Get event info")
+        self._print("[a] Add a player")
+        self._print("[r] Remove a player")
+        self._print("[c] Close an event")
+        self._print("[d] Delete an event")
+        self._print("[s] Get player's SS")
+        self._print("[v] Verify santa maps")
+        self._print("[m] Return to main")
+        self._print("[q] Quit")
+
+        return await self._input("What would you like to do? ")
 
 
     def _validate_event_id(self, event_id:str) -> str:
@@ -45,73 +79,75 @@ class SSCli:
             return ""
         return event_id
         
-    def get_global_choice(self):
+    async def get_global_choice(self):
         "get the global choice"
         # Let users know what they can do.
-        print("\n[l] See a list of events")
-        print("[m] Return to main")
-        print("[q] Quit.")
+        self._print("\n[l] See a list of events")
+        self._print("[m] Return to main")
+        self._print("[q] Quit.")
 
-        return input("What would you like to do? ")
+        return await self._input("What would you like to do? ")
 
-    def get_event_id(self):
+    async def get_event_id(self):
         """get the event id from the user"""
-        return self._validate_event_id(input("What is the event id? "))
+        return self._validate_event_id(await self._input("What is the event id? "))
 
-    def get_location(self):
+    async def get_location(self):
         """get the location of the event"""
-        return input("What is the location of the event? ")
+        return await self._input("What is the location of the event? ")
 
-    def get_players(self) -> List[str]:
+    async def get_players(self) -> List[str]:
         """Get the players playing the game"""
-        res = input("What is the names of players(ex: john, robert, tom, ...)? ")
+        res = await self._input("What is the names of players(ex: john, robert, tom, ...)? ")
         return res.split(",")
 
-    def get_event_status(self) -> bool:
+    async def get_event_status(self) -> bool:
         """Get the status of the events"""
-        res = input("Is the event open to the public [Y/n]? ")
+        res = await self._input("Is the event open to the public [Y/n]? ")
         if res.lower() == "y":
             return True
         else:
             return False
 
-    def get_player_name(self):
+    async def get_player_name(self):
         """Get the value of the player name"""
-        return input("What is the name of the player you want to add? ")
+        return await self._input("What is the name of the player you want to add? ")
 
-    def get_event_name(self):
+    async def get_event_name(self):
         """Get the value of the new event"""
-        return input("What is the name of the new event? ")
+        return await self._input("What is the name of the new event? ")
 
     def dis_event_close_msg(self, event_id:str):
         """Display event close message"""
-        print(f"\n{event_id=} is closed and cannot be modified")
+        self._print(f"\n{event_id=} is closed and cannot be modified")
 
     def dis_event_info(self, event: Event):
         """Displays event info"""
-        print(f"\n{event.event_id=}")
-        print(f"{event.event_name=}")
-        print(f"{event.event_status.name=}")
-        print(f"{event.event_location=}")
-        print(f"Event datetime={event.event_date_time.strftime('%d-%b-%Y %I:%M %p')}")
-        print(f"{event.event_participants=}")
-        print(f"{event.event_santa_map=}")
+        self._print(f"\n{event.event_id=}")
+        self._print(f"{event.event_name=}")
+        self._print(f"{event.event_status.name=}")
+        self._print(f"{event.event_location=}")
+        self._print(f"Event datetime={event.event_date_time.strftime('%d-%b-%Y %I:%M %p')}")
+        self._print(f"{event.event_participants=}")
+        self._print(f"{event.event_santa_map=}")
+        if event.event_previous_id:
+            self._print(f"{event.event_previous_id=}")
 
     def dis_event_not_found(self, event_id: str):
         """Displayed a failed event get"""
-        print(f"{event_id=} was not found in the system. Are you sure about the event_id?")
+        self._print(f"{event_id=} was not found in the system. Are you sure about the event_id?")
 
     def dis_cancel_event_msg(self, event_id: str):
         """Message when event is deleted"""
-        print(f"\n{event_id=} has been deleted")
+        self._print(f"\n{event_id=} has been deleted")
 
     def dis_event_update_msg(self, event_id: str):
         """Message when event is deleted"""
-        print(f"\n{event_id=} has been updated")
+        self._print(f"\n{event_id=} has been updated")
 
     def dis_ss_message(self, event_id: str, player:str, ss: str):
         """displays the message for secrete santa"""
-        print(f"{player=} in this {event_id=} has {ss=} as their secrete santa ")
+        self._print(f"{player=} in this {event_id=} has {ss=} as their secrete santa ")
 
     def dis_events(self, events: List[Event]):
         """Prints the list names"""
@@ -119,13 +155,21 @@ class SSCli:
         "| Name          ",
         "| State  ",
         )
-        print()
+        self._print()
         header = "".join(columns)
-        print(header)
+        self._print(header)
         for event in events:
             event_str = f"{event.event_id[:5]} | {event.event_name} | {event.event_status.name}"
-            print(event_str)
+            self._print(event_str)
+
+    def dis_audit_report(self, event_ids: List[str]):
+        """Displays the events that failed the santa map audit"""
+        if not event_ids:
+            self._print("\nAll santa maps are valid")
+            return
+        self._print(f"\n{len(event_ids)} events have an invalid santa map:")
+        self._print(", ".join(event_ids))
 
     def dis_error(self, msg: str):
         """display any generic error"""
-        print("\n", msg)
+        self._print("\n", msg)
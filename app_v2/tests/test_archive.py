@@ -0,0 +1,146 @@
+"""Test for the cold tier of SSDataStore"""
+import os
+import asyncio
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from src.archive import SSColdStore
+from src.models import EventStatus
+from src.store import SSDataStore
+
+class SSColdStoreTest(unittest.TestCase):
+    """Test of archiving and reloading events"""
+
+    def setUp(self) -> None:
+        """Setup for SSColdStoreTest"""
+        self.cold = SSColdStore(max_entries=1)
+        self.store = SSDataStore(self.cold)
+        old = datetime.now() - timedelta(days=40)
+        self.closed_id = self.store.create_event("Christmas", old, ["A", "B", "C"], True, seed=1)
+        self.open_id = self.store.create_event("Party", old, ["A", "B"])
+        self.hot_id = self.store.create_event("Dinner", datetime.now(), ["A", "B"])
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        """Removes the archive"""
+        self.store.close()
+        return super().tearDown()
+
+    def test_archive_and_reload_case(self):
+        """Old events move to disk and are reloaded on access"""
+        santa = self.store.get_player_secret_santa(self.closed_id, "A")
+        self.assertEqual(2, self.store.archive_events())
+        self.assertEqual([self.hot_id], list(self.store.snapshot()))
+        self.assertEqual(santa, self.store.get_player_secret_santa(self.closed_id, "A"))
+        self.assertEqual(EventStatus.EXPIRED, self.store.get_event(self.open_id).event_status)
+        self.assertEqual(1, self.cold.metrics()["cached_entries"])
+        with self.assertRaises(ValueError):
+            self.store.add_player(self.closed_id, "D")
+        with self.assertRaises(ValueError):
+            self.store.close_event(self.open_id)
+
+    def test_lru_hit_rate_case(self):
+        """Repeated reads are served from the cache"""
+        self.store.archive_events()
+        self.store.get_event(self.closed_id)
+        self.store.get_event(self.closed_id)
+        metrics = self.cold.metrics()
+        self.assertEqual(1, metrics["hits"])
+        self.assertEqual(1, metrics["misses"])
+        self.assertEqual(0.5, metrics["hit_rate"])
+
+    def test_cancel_archived_event_case(self):
+        """Cancelling an archived event deletes its file"""
+        self.store.archive_events()
+        self.store.cancel_event(self.closed_id)
+        self.assertIsNone(self.store.get_event(self.closed_id))
+        self.assertEqual([self.open_id], list(self.cold))
+
+    def test_recurrence_of_archived_event_case(self):
+        """Archived events recur without a disk load and share equal rosters"""
+        other_id = self.store.create_event("Christmas", datetime.now() - timedelta(days=40),
+                                           ["A", "B", "C"])
+        self.store.archive_events()
+        next_id = self.store.create_recurrence(self.closed_id, datetime.now())
+        other_next_id = self.store.create_recurrence(other_id, datetime.now())
+        self.assertEqual(0, self.cold.metrics()["disk_loads"])
+        event = self.store.get_event(next_id)
+        self.assertEqual(("Christmas", self.closed_id), (event.event_name, event.event_previous_id))
+        self.assertIs(event.event_participants,
+                      self.store.get_event(other_next_id).event_participants)
+
+    def test_archived_records_are_bounded_case(self):
+        """Old records are evicted and rosters go with their last record"""
+        store = SSDataStore(max_archived_records=2)
+        try:
+            old = datetime.now() - timedelta(days=40)
+            ids = [store.create_event("Christmas", old, ["A", "B", "C"]) for _ in range(3)]
+            ids.append(store.create_event("Party", old, ["D", "E"]))
+            store.archive_events()
+            self.assertEqual(ids[2:], list(store.archived))
+            self.assertEqual(2, len(store.rosters))
+            store.create_recurrence(ids[0], datetime.now())
+            self.assertEqual(1, store.cold.metrics()["disk_loads"])
+            store.create_recurrence(ids[2], datetime.now())
+            store.cancel_event(ids[3])
+            self.assertEqual([ids[2]], list(store.archived))
+            self.assertEqual(1, len(store.rosters))
+            store.cancel_event(ids[2])
+            self.assertEqual({}, store.rosters)
+        finally:
+            store.close()
+
+    def test_write_during_archive_case(self):
+        """An event replaced while its file is written stays hot"""
+        archive = self.cold.archive
+
+        def add_player_during_write(event):
+            archive(event)
+            if event.event_id == self.open_id:
+                self.store.add_player(self.open_id, "C")
+        self.cold.archive = add_player_during_write
+        self.assertEqual(1, self.store.archive_events())
+        self.assertEqual([self.closed_id], list(self.cold))
+        self.assertEqual(["A", "B", "C"], self.store.get_event(self.open_id).event_participants)
+        self.cold.archive = archive
+        self.assertEqual(1, self.store.archive_events())
+        self.assertEqual(EventStatus.EXPIRED, self.store.get_event(self.open_id).event_status)
+
+    def test_archive_periodically_case(self):
+        """The background archiver moves old events without a caller"""
+        async def run_archiver():
+            archiver = asyncio.create_task(self.store.archive_periodically(0.01))
+            await asyncio.sleep(0.1)
+            archiver.cancel()
+        asyncio.run(run_archiver())
+        self.assertEqual([self.hot_id], list(self.store.snapshot()))
+
+    def test_invalid_event_id_case(self):
+        """Ids that are not event ids never reach the file system"""
+        self.store.archive_events()
+        with tempfile.TemporaryDirectory() as other:
+            victim = os.path.join(other, "victim.pkl")
+            with open(victim, "wb") as file:
+                file.write(b"not a pickle")
+            path = os.path.relpath(os.path.join(other, "victim"), self.cold.path)
+            self.store.cancel_event(path)
+            self.assertIsNone(self.store.get_event(path))
+            self.assertTrue(os.path.exists(victim))
+        self.assertIsNone(self.store.get_event("../0"))
+
+    def test_close_removes_temporary_archive_case(self):
+        """The temporary archive directory is removed on close"""
+        self.store.archive_events()
+        path = self.cold.path
+        self.store.close()
+        self.assertFalse(os.path.exists(path))
+
+    def test_existing_archive_case(self):
+        """An archive directory is indexed when reopened"""
+        with tempfile.TemporaryDirectory() as path:
+            SSColdStore(path).archive(self.store.get_event(self.closed_id))
+            reopened = SSColdStore(path)
+            self.assertEqual([self.closed_id], list(reopened))
+            self.assertEqual("Christmas", reopened.get(self.closed_id).event_name)
+            reopened.close()
+            self.assertTrue(os.path.exists(path))
@@ -0,0 +1,89 @@
+"""Test for the santa map audit"""
+import tempfile
+import unittest
+from dataclasses import replace
+from datetime import datetime, timedelta
+from src.archive import SSColdStore
+from src.audit import audit_events
+from src.models import Event, EventStatus
+from src.store import SSDataStore
+
+class SSAuditTest(unittest.TestCase):
+    """Test of the checks on closed events"""
+
+    def event(self, event_id, participants, santa_map, status=EventStatus.CLOSED):
+        """Returns an event with the given participants and santa map"""
+        return Event(event_id, "Christmas", datetime.now(), status, participants, santa_map)
+
+    def test_valid_map_case(self):
+        """A single cycle and an empty event pass"""
+        self.assertEqual([], audit_events([
+            self.event("1", ["A", "B", "C"], {"A": "B", "B": "C", "C": "A"}),
+            self.event("2", ["A", "B"], {"A": "B", "B": "A"}),
+            self.event("3", [], {}),
+        ]))
+
+    def test_fixed_point_case(self):
+        """A player giving to themselves is flagged"""
+        self.assertEqual(["1"], audit_events([
+            self.event("1", ["A", "B", "C"], {"A": "A", "B": "C", "C": "B"}),
+        ]))
+
+    def test_duplicate_receiver_case(self):
+        """Two givers with the same receiver are flagged"""
+        self.assertEqual(["1"], audit_events([
+            self.event("1", ["A", "B", "C"], {"A": "B", "B": "A", "C": "A"}),
+        ]))
+
+    def test_foreign_giver_case(self):
+        """A giver who is not a participant is flagged"""
+        self.assertEqual(["1"], audit_events([
+            self.event("1", ["A", "B", "C"], {"A": "B", "B": "C", "D": "A"}),
+        ]))
+
+    def test_duplicate_participant_case(self):
+        """A participant listed twice is flagged"""
+        self.assertEqual(["1", "2"], audit_events([
+            self.event("1", ["A", "A", "B"], {"A": "B", "B": "A"}),
+            self.event("2", ["A", "A", "B"], {"A": "B", "B": "C", "C": "A"}),
+        ]))
+
+    def test_empty_map_case(self):
+        """A closed event with players but no map is flagged, open ones are skipped"""
+        self.assertEqual(["1"], audit_events([
+            self.event("1", ["A", "B"], {}),
+            self.event("2", ["A", "B"], {}, EventStatus.OPEN),
+        ]))
+        self.assertEqual([], audit_events([]))
+
+    def test_audit_store_case(self):
+        """Events closed by the store pass, broken hot and archived ones are reported"""
+        store = SSDataStore()
+        try:
+            for size in range(2, 10):
+                store.create_event("Christmas", datetime.now() - timedelta(days=40 * (size % 2)),
+                                   [f"P{index}" for index in range(size)], True, seed=size)
+            self.assertEqual([], store.audit())
+            for event_id in ("0", "1"):
+                event = store.get_event(event_id)
+                store.apply(store.version + 1, "put", replace(
+                    event, event_santa_map=dict(zip(event.event_participants,
+                                                    event.event_participants))))
+            store.archive_events()
+            self.assertEqual(["0", "1"], store.audit())
+            self.assertEqual(0, store.cold.metrics()["disk_loads"])
+            store.cancel_event("1")
+            self.assertEqual(["0"], store.audit())
+        finally:
+            store.close()
+
+    def test_audit_existing_archive_case(self):
+        """Events archived before the store opened are loaded once"""
+        with tempfile.TemporaryDirectory() as path:
+            SSColdStore(path).archive(self.event("7", ["A", "B"], {"A": "A", "B": "B"}))
+            SSColdStore(path).archive(self.event("8", ["A", "B"], {"A": "B", "B": "A"}))
+            store = SSDataStore(SSColdStore(path))
+            self.assertEqual(["7"], store.audit())
+            self.assertEqual(["7"], store.audit())
+            self.assertEqual(2, store.cold.metrics()["disk_loads"])
+            store.close()
@@ -0,0 +1,81 @@
+"""Test for the santa map draws"""
+import unittest
+from datetime import datetime
+from src.draw import single_cycle_map, parallel_single_cycle_map, excluding_map, draw_pool
+from src.store import SSDataStore
+
+class SSDrawTest(unittest.TestCase):
+    """Test of the serial and parallel draws"""
+
+    def setUp(self) -> None:
+        """Setup for SSDrawTest"""
+        self.players = [f"P{index}" for index in range(50)]
+        return super().setUp()
+
+    def assert_single_cycle(self, santa_map):
+        """Checks the map is one cycle over all players without self assignment"""
+        self.assertEqual(set(self.players), set(santa_map))
+        self.assertEqual(set(self.players), set(santa_map.values()))
+        for giver, receiver in santa_map.items():
+            self.assertNotEqual(giver, receiver)
+        player, seen = self.players[0], 0
+        while True:
+            player, seen = santa_map[player], seen + 1
+            if player == self.players[0]:
+                break
+        self.assertEqual(len(self.players), seen)
+
+    def test_single_cycle_map_case(self):
+        """Serial draw is a reproducible single cycle"""
+        santa_map = single_cycle_map(self.players, seed=7)
+        self.assert_single_cycle(santa_map)
+        self.assertEqual(santa_map, single_cycle_map(self.players, seed=7))
+
+    def test_parallel_single_cycle_map_case(self):
+        """Parallel draw is a single cycle reproducible by seed and workers"""
+        santa_map = parallel_single_cycle_map(self.players, 3, seed=7)
+        self.assert_single_cycle(santa_map)
+        self.assertEqual(santa_map, parallel_single_cycle_map(self.players, 3, seed=7))
+
+    def test_parallel_draw_pool_case(self):
+        """A long lived pool gives the same map as a pool per draw"""
+        with draw_pool(2) as pool:
+            self.assertEqual(parallel_single_cycle_map(self.players, 2, seed=3),
+                             parallel_single_cycle_map(self.players, 2, seed=3, pool=pool))
+
+    def test_duplicate_players_case(self):
+        """Players listed twice are drawn once and never give to themselves"""
+        players = ["A", "B", "A", "C"]
+        with draw_pool(2) as pool:
+            santa_maps = [parallel_single_cycle_map(players, 2, seed, pool) for seed in range(5)]
+        santa_maps.extend(single_cycle_map(players, seed) for seed in range(100))
+        for santa_map in santa_maps:
+            self.assertEqual({"A", "B", "C"}, set(santa_map))
+            self.assertEqual({"A", "B", "C"}, set(santa_map.values()))
+            for giver, receiver in santa_map.items():
+                self.assertNotEqual(giver, receiver)
+        store = SSDataStore()
+        try:
+            event_id = store.create_event("Christmas", datetime.now(), players)
+            store.add_player(event_id, "B")
+            self.assertEqual(["A", "B", "C"], store.get_event(event_id).event_participants)
+        finally:
+            store.close()
+
+    def test_not_enough_players_case(self):
+        """Less than two players cannot be drawn"""
+        self.assertEqual({}, single_cycle_map(["A"]))
+        self.assertEqual({}, parallel_single_cycle_map([], 2))
+
+    def test_two_players_case(self):
+        """Two players give to each other"""
+        self.assertEqual({"A": "B", "B": "A"}, single_cycle_map(["A", "B"], seed=1))
+
+    def test_excluding_map_case(self):
+        """Excluded pairs are avoided when possible"""
+        previous = single_cycle_map(self.players, seed=1)
+        santa_map = excluding_map(lambda seed: single_cycle_map(self.players, seed),
+                                  previous, seed=2)
+        self.assert_single_cycle(santa_map)
+        for giver, receiver in santa_map.items():
+            self.assertNotEqual(previous[giver], receiver)
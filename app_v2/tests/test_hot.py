@@ -0,0 +1,86 @@
+"""Test for the hot tier of SSDataStore"""
+import unittest
+from dataclasses import replace
+from datetime import datetime
+from src.hot import NUM_SHARDS, SSHotTier
+from src.models import Event, EventStatus
+from src.store import SSDataStore
+
+class SSHotTierTest(unittest.TestCase):
+    """Test of the copy-on-write shards and their snapshots"""
+
+    def setUp(self) -> None:
+        """Setup for SSHotTierTest"""
+        self.tier = SSHotTier()
+        for event_id in range(20):
+            self.tier.set(self.event(str(event_id)))
+        return super().setUp()
+
+    def event(self, event_id, name="Christmas"):
+        """Returns an open event"""
+        return Event(event_id, name, datetime.now(), EventStatus.OPEN, ["A", "B"], {})
+
+    def test_set_get_pop_case(self):
+        """Events are stored, replaced and removed"""
+        self.assertEqual(20, len(self.tier))
+        self.tier.set(self.event("3", "Party"))
+        self.assertEqual(20, len(self.tier))
+        self.assertEqual("Party", self.tier["3"].event_name)
+        self.assertEqual("3", self.tier.pop("3").event_id)
+        self.assertNotIn("3", self.tier)
+        self.assertIsNone(self.tier.get("3"))
+        self.assertEqual(19, len(self.tier))
+
+    def test_snapshot_is_isolated_case(self):
+        """Writes after a snapshot never show up in it"""
+        snapshot = self.tier.snapshot()
+        self.tier.set(replace(self.tier["1"], event_name="Party"))
+        self.tier.set(self.event("20"))
+        self.tier.pop("2")
+        self.assertEqual("Christmas", snapshot["1"].event_name)
+        self.assertNotIn("20", snapshot)
+        self.assertIn("2", snapshot)
+        self.assertEqual(20, len(snapshot))
+        self.assertEqual([str(event_id) for event_id in range(20)], list(snapshot))
+        self.assertEqual("Party", self.tier["1"].event_name)
+        self.assertEqual(20, len(self.tier))
+
+    def test_copy_only_written_shards_case(self):
+        """The first write after a snapshot copies its shard once"""
+        snapshot = self.tier.snapshot()
+        index = hash("1") % NUM_SHARDS
+        self.tier.set(replace(self.tier["1"], event_name="Party"))
+        copied = self.tier.shards[index]
+        self.assertIsNot(snapshot.shards[index], copied)
+        self.tier.set(replace(self.tier["1"], event_name="Dinner"))
+        self.assertIs(copied, self.tier.shards[index])
+        shared = [position for position in range(NUM_SHARDS)
+                  if snapshot.shards[position] is self.tier.shards[position]]
+        self.assertEqual(NUM_SHARDS - 1, len(shared))
+
+        second = self.tier.snapshot()
+        self.tier.pop("1")
+        self.assertEqual("Dinner", second["1"].event_name)
+        self.assertEqual("Christmas", snapshot["1"].event_name)
+
+    def test_clear_after_snapshot_case(self):
+        """Clearing leaves earlier snapshots whole"""
+        snapshot = self.tier.snapshot()
+        self.tier.clear()
+        self.assertEqual(0, len(self.tier))
+        self.tier.set(self.event("0", "Party"))
+        self.assertEqual(20, len(snapshot))
+        self.assertEqual("Christmas", snapshot["0"].event_name)
+        self.assertEqual(["0"], list(self.tier.snapshot()))
+
+    def test_listing_order_case(self):
+        """The store lists events in creation order"""
+        store = SSDataStore()
+        try:
+            ids = [store.create_event(f"Event {index}", datetime.now(), ["A", "B"])
+                   for index in range(300)]
+            store.cancel_event(ids[10])
+            self.assertEqual(ids[:10] + ids[11:],
+                             [event.event_id for event in store.get_events()])
+        finally:
+            store.close()
@@ -0,0 +1,171 @@
+"""Test for the primary/replica log shipping"""
+import json
+import asyncio
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+from src import replication
+from src.replication import (CHUNK_SIZE, LINE_LIMIT, SSReplica, SSReplicationPrimary,
+                             _encode_entry, _read_entry, decode_event)
+from src.store import SSDataStore
+
+@mock.patch.object(replication, "HEARTBEAT_INTERVAL", 0.05)
+class SSReplicationTest(unittest.IsolatedAsyncioTestCase):
+    """Test of the mutation log, its copies and the replica reads"""
+
+    async def asyncSetUp(self) -> None:
+        """Setup for SSReplicationTest"""
+        self.store = SSDataStore()
+        self.replica = SSReplica("127.0.0.1", 0, store=SSDataStore())
+        self.servers = []
+
+    async def asyncTearDown(self) -> None:
+        """Stops the servers and removes the archives"""
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.store.close()
+        self.replica.store.close()
+
+    async def start_server(self, handle):
+        """Serves handle on a free local port and returns the port"""
+        server = await asyncio.start_server(handle, "127.0.0.1", 0, limit=LINE_LIMIT)
+        self.servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    async def follow(self, port, until):
+        """Follows the primary on port until the condition holds"""
+        self.replica.primary_port = port
+        follower = asyncio.create_task(self.replica.follow())
+        try:
+            for _ in range(200):
+                if until():
+                    return
+                await asyncio.sleep(0.01)
+            self.fail("the replica did not catch up")
+        finally:
+            follower.cancel()
+            await asyncio.gather(follower, return_exceptions=True)
+            # let the primary notice the closed connection
+            await asyncio.sleep(0.2)
+
+    async def test_chunked_put_case(self):
+        """Large events are split in lines below the limit and read back whole"""
+        event_id = self.store.create_event("Christmas", datetime.now(),
+                                           [f"player-{index}" for index in range(100_000)],
+                                           True, seed=1)
+        event = self.store.get_event(event_id)
+        data = _encode_entry(3, "put", event)
+        lines = data.splitlines()
+        self.assertGreater(len(lines), 2)
+        self.assertLess(max(map(len, lines)), 2 * CHUNK_SIZE)
+        reader = asyncio.StreamReader(limit=LINE_LIMIT)
+        reader.feed_data(data + _encode_entry(4, "delete", event_id))
+        reader.feed_eof()
+        self.assertEqual(event, decode_event((await _read_entry(reader))["event"]))
+        self.assertEqual(event_id, (await _read_entry(reader))["event_id"])
+        self.assertIsNone(await _read_entry(reader))
+
+    async def test_copy_is_gated_until_synced_case(self):
+        """The replica stays at version 0 until the copy is complete"""
+        event_id = self.store.create_event("Christmas", datetime.now(), ["A", "B"])
+        self.replica.apply(json.loads(_encode_entry(5, "reset", None)))
+        self.replica.apply(json.loads(_encode_entry(5, "put", self.store.get_event(event_id))))
+        self.assertEqual(0, self.replica.store.version)
+        self.assertEqual(5, self.replica.lag()["versions"])
+        self.assertTrue(self.replica.syncing)
+        self.replica.apply(json.loads(_encode_entry(5, "synced", None)))
+        self.assertEqual(5, self.replica.store.version)
+        self.assertEqual(0, self.replica.lag()["versions"])
+        self.replica.apply(json.loads(_encode_entry(6, "delete", event_id)))
+        self.assertEqual(6, self.replica.store.version)
+        self.assertIsNone(self.replica.store.get_event(event_id))
+
+    async def test_min_version_wait_case(self):
+        """Reads wait for the version they ask for, or time out"""
+        event_id = self.store.create_event("Christmas", datetime.now(), ["A", "B"], True)
+        read = asyncio.create_task(self.replica.read(
+            {"op": "get_event", "event_id": event_id, "min_version": 1}))
+        await asyncio.sleep(0.05)
+        self.assertFalse(read.done())
+        self.replica.apply(json.loads(_encode_entry(1, "put", self.store.get_event(event_id))))
+        async with self.replica.applied:
+            self.replica.applied.notify_all()
+        response = await asyncio.wait_for(read, 1)
+        self.assertTrue(response["ok"])
+        self.assertEqual(["A", "B"], response["event"]["event_participants"])
+        response = await self.replica.read({"op": "get_event", "event_id": event_id,
+                                            "min_version": 2, "timeout": 0.05})
+        self.assertFalse(response["ok"])
+
+    async def test_invalid_requests_case(self):
+        """Malformed requests get an error and keep the connection open"""
+        port = await self.start_server(self.replica.handle)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        requests = [b"[1]", b'{"op": "get_event", "min_version": "3"}',
+                    b'{"op": "get_event", "timeout": "1"}', b'{"op": "get_event", "event_id": [1]}',
+                    b'{"op": "get_player_secret_santa", "player": 3}', b"not json",
+                    b'{"op": "status"}']
+        for request in requests:
+            writer.write(request + b"\n")
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in requests]
+        self.assertEqual([False] * 6 + [True], [response["ok"] for response in responses])
+        writer.close()
+        await writer.wait_closed()
+
+        port = await self.start_server(SSReplicationPrimary(self.store).handle)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"[]\n")
+        self.assertFalse(json.loads(await reader.readline())["ok"])
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_primary_to_replica_case(self):
+        """A replica copies the hot and archived events, then follows writes"""
+        old = datetime.now() - timedelta(days=40)
+        for index in range(10):
+            self.store.create_event(f"Event {index}", old if index % 2 else datetime.now(),
+                                    ["A", "B", "C"], True)
+        self.store.archive_events()
+        primary = SSReplicationPrimary(self.store)
+        primary.loop = asyncio.get_running_loop()
+        port = await self.start_server(primary.handle)
+        event_id = None
+
+        def synced_then_write():
+            nonlocal event_id
+            if self.replica.syncing or self.replica.store.version != self.store.version:
+                return False
+            if event_id is None:
+                event_id = self.store.create_event("Late", datetime.now(), ["X", "Y"])
+                self.store.add_player(event_id, "Z")
+                return False
+            return True
+        await self.follow(port, synced_then_write)
+        for index in range(10):
+            self.assertEqual(self.store.get_event(str(index)),
+                             self.replica.store.get_event(str(index)))
+        self.assertEqual(["X", "Y", "Z"],
+                         self.replica.store.get_event(event_id).event_participants)
+
+    async def test_resync_on_bad_line_case(self):
+        """A bad line from the primary makes the replica start over"""
+        connections = 0
+
+        async def primary(reader, writer):
+            nonlocal connections
+            connections += 1
+            await reader.readline()
+            if connections == 1:
+                writer.write(b"not json\n")
+            else:
+                writer.write(_encode_entry(3, "reset", None) + _encode_entry(3, "synced", None))
+            await writer.drain()
+            await reader.read()
+            writer.close()
+        port = await self.start_server(primary)
+        with mock.patch("builtins.print"):
+            await self.follow(port, lambda: self.replica.store.version == 3)
+        self.assertEqual(2, connections)
+        self.assertFalse(self.replica.syncing)
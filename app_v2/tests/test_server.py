@@ -0,0 +1,58 @@
+"""Test for sessions served over TCP"""
+import asyncio
+import unittest
+from src.server import SSServer
+from src.store import SSDataStore
+
+class SSServerTest(unittest.IsolatedAsyncioTestCase):
+    """Test of several sessions sharing one store"""
+
+    async def asyncSetUp(self) -> None:
+        """Setup for SSServerTest"""
+        self.store = SSDataStore()
+        self.server = SSServer(self.store)
+        self.tcp_server = await asyncio.start_server(self.server.handle, "127.0.0.1", 0)
+        self.port = self.tcp_server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self) -> None:
+        """Stops the server and removes the archive"""
+        self.tcp_server.close()
+        await self.tcp_server.wait_closed()
+        self.store.close()
+
+    async def answer(self, reader, writer, answers):
+        """Answers every prompt in turn and returns what the session printed"""
+        output = b""
+        for answer in answers:
+            output += await asyncio.wait_for(reader.readuntil(b"? "), 5)
+            writer.write(f"{answer}\n".encode())
+            await writer.drain()
+        return output.decode()
+
+    async def test_two_sessions_case(self):
+        """An event created by one session is seen and updated by another"""
+        reader_a, writer_a = await asyncio.open_connection("127.0.0.1", self.port)
+        reader_b, writer_b = await asyncio.open_connection("127.0.0.1", self.port)
+
+        output = await self.answer(reader_a, writer_a, ["n", "Party", "Home", "A,B", "y", "m"])
+        self.assertIn("event.event_name='Party'", output)
+        self.assertEqual(2, self.server.num_sessions)
+
+        output = await self.answer(reader_b, writer_b, ["a", "0", "C", "m", "r", "99", "C", "m"])
+        self.assertIn("event.event_participants=['A', 'B', 'C']", output)
+        self.assertIn("event_id='99' not found", output)
+
+        output = await self.answer(reader_a, writer_a, ["g", "0", "q"])
+        self.assertIn("event.event_participants=['A', 'B', 'C']", output)
+        await reader_a.read()
+        writer_a.close()
+        await writer_a.wait_closed()
+
+        output = await self.answer(reader_b, writer_b, ["c", "0", "q"])
+        self.assertIn("event_id='0' is closed", output)
+        await reader_b.read()
+        writer_b.close()
+        await writer_b.wait_closed()
+
+        self.assertEqual(0, self.server.num_sessions)
+        self.assertEqual(3, len(self.store.get_event("0").event_santa_map))